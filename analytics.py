@@ -0,0 +1,182 @@
+from collections import Counter
+from datetime import datetime
+from filelock import FileLock
+from helper import load_json, save_json
+
+# Cupos por turno (mismo límite que usa la reserva en app.py)
+CUPO_POR_TURNO = 2
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+
+def _lock_cache(cache_file):
+    # Serializa leer datos + recalcular + guardar el cache contra invalidar_mes,
+    # para que un agregado viejo no pise una invalidación concurrente
+    return FileLock(f"{cache_file}.tx.lock")
+
+
+def _mes_vacio():
+    return {
+        "ocupacion": Counter(),
+        "capacidad": Counter(),
+        "impagos": Counter(),
+        "pendientes": Counter(),
+        "reservas": 0,
+        "ausencias": 0,
+    }
+
+
+def _agregar(bookings, availability, omitir=(), ahora=None):
+    """Recorre bookings y availability una sola vez y acumula los agregados por mes.
+
+    Los meses en `omitir` (ya cacheados) no se recorren.
+    """
+    ahora = ahora or datetime.now()
+    por_mes = {}
+    for date_str, horas in bookings.items():
+        mes = date_str[:7]
+        if mes in omitir:
+            continue
+        try:
+            dia = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            continue
+        datos = por_mes.setdefault(mes, _mes_vacio())
+        dia_semana = dia.weekday()
+        for hora, usuarios in horas.items():
+            try:
+                pasado = datetime.strptime(f"{date_str} {hora}", "%Y-%m-%d %H:%M") <= ahora
+            except ValueError:
+                pasado = dia.date() < ahora.date()
+            datos["ocupacion"][f"{dia_semana}|{hora}"] += len(usuarios)
+            datos["reservas"] += len(usuarios)
+            for username, meta in usuarios.items():
+                if meta.get("ausente"):
+                    datos["ausencias"] += 1
+                # Solo se adeudan los turnos ya transcurridos. Las ausencias se
+                # cobran igual que una sesión, así que cuentan si no se pagaron.
+                if not meta.get("pagado"):
+                    datos["impagos" if pasado else "pendientes"][username] += 1
+
+    for date_str, slots in availability.items():
+        mes = date_str[:7]
+        if mes in omitir:
+            continue
+        try:
+            dia_semana = datetime.strptime(date_str, "%Y-%m-%d").weekday()
+        except ValueError:
+            continue
+        capacidad = por_mes.setdefault(mes, _mes_vacio())["capacidad"]
+        for hora in slots:
+            capacidad[f"{dia_semana}|{hora}"] += CUPO_POR_TURNO
+    return por_mes
+
+
+def agregados_por_mes(bookings_file, avail_file, cache_file):
+    """Devuelve {mes: agregados}, reutilizando del cache los meses ya cerrados."""
+    ahora = datetime.now()
+    mes_actual = ahora.strftime("%Y-%m")
+    with _lock_cache(cache_file):
+        cache = load_json(cache_file)
+        bookings = load_json(bookings_file)
+        availability = load_json(avail_file)
+
+        nuevos = _agregar(bookings, availability, omitir=cache, ahora=ahora)
+        resultado = dict(cache)
+        resultado.update(nuevos)
+        cerrados = {mes: datos for mes, datos in nuevos.items() if mes < mes_actual}
+        if cerrados:
+            cache.update(cerrados)
+            save_json(cache_file, cache)
+    return resultado
+
+
+def invalidar_mes(cache_file, date_str):
+    """Descarta el agregado cacheado del mes de `date_str` (YYYY-MM-DD).
+
+    Debe llamarse después de guardar el cambio en bookings/availability.
+    """
+    mes = (date_str or "")[:7]
+    with _lock_cache(cache_file):
+        cache = load_json(cache_file)
+        if mes in cache:
+            cache.pop(mes)
+            save_json(cache_file, cache)
+
+
+def invalidar_todo(cache_file):
+    """Descarta todos los agregados cacheados (p.ej. después de restaurar un snapshot)."""
+    with _lock_cache(cache_file):
+        save_json(cache_file, {})
+
+
+def combinar_meses(lista_por_mes):
+    """Suma los agregados mensuales de varias particiones en uno solo."""
+    combinado = {}
+    for por_mes in lista_por_mes:
+        for mes, datos in por_mes.items():
+            actual = combinado.setdefault(mes, {
+                "ocupacion": Counter(), "capacidad": Counter(), "impagos": Counter(),
+                "pendientes": Counter(), "reservas": 0, "ausencias": 0,
+            })
+            actual["ocupacion"].update(datos["ocupacion"])
+            actual["capacidad"].update(datos["capacidad"])
+            actual["impagos"].update(datos["impagos"])
+            actual["pendientes"].update(datos.get("pendientes", {}))
+            actual["reservas"] += datos["reservas"]
+            actual["ausencias"] += datos["ausencias"]
+    return combinado
+
+
+def resumen(por_mes, users, precio_sesion=None):
+    """Combina los agregados mensuales en las tablas que muestra el panel."""
+    ocupacion = Counter()
+    capacidad = Counter()
+    impagos = Counter()
+    pendientes = Counter()
+    tendencia = []
+    for mes in sorted(por_mes):
+        datos = por_mes[mes]
+        ocupacion.update(datos["ocupacion"])
+        capacidad.update(datos["capacidad"])
+        impagos.update(datos["impagos"])
+        pendientes.update(datos.get("pendientes", {}))
+        reservas = datos["reservas"]
+        ausencias = datos["ausencias"]
+        tasa = round(100 * ausencias / reservas, 1) if reservas else 0.0
+        tendencia.append((mes, reservas, ausencias, tasa))
+
+    horas = sorted({k.split("|", 1)[1] for k in ocupacion} | {k.split("|", 1)[1] for k in capacidad})
+    tabla_ocupacion = []
+    for dia in range(7):
+        fila = []
+        for hora in horas:
+            clave = f"{dia}|{hora}"
+            reservadas = ocupacion.get(clave, 0)
+            cupos = capacidad.get(clave, 0)
+            porcentaje = round(100 * reservadas / cupos, 1) if cupos else None
+            fila.append((reservadas, cupos, porcentaje))
+        tabla_ocupacion.append((DIAS_SEMANA[dia], fila))
+
+    # Los impagos se guardan por usuario y se agrupan acá, así un cambio de
+    # categoría en el perfil no deja desactualizado el cache
+    impagos_categoria = Counter()
+    pendientes_categoria = Counter()
+    for username, cantidad in impagos.items():
+        categoria = users.get(username, {}).get("categoria") or "Sin categoría"
+        impagos_categoria[categoria] += cantidad
+    for username, cantidad in pendientes.items():
+        categoria = users.get(username, {}).get("categoria") or "Sin categoría"
+        pendientes_categoria[categoria] += cantidad
+    tabla_impagos = [
+        (categoria, impagos_categoria[categoria],
+         impagos_categoria[categoria] * precio_sesion if precio_sesion is not None else None,
+         pendientes_categoria[categoria])
+        for categoria in sorted(set(impagos_categoria) | set(pendientes_categoria))
+    ]
+
+    return {
+        "horas": horas,
+        "ocupacion": tabla_ocupacion,
+        "impagos": tabla_impagos,
+        "ausencias": tendencia,
+    }
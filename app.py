@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import os
 import json
+import math
 from filelock import FileLock
 from helper import load_json, save_json
 import csv
@@ -12,27 +13,49 @@ from flask import Response
 import re
 EMAIL_REGEX = re.compile(r"[^@]+@[^@]+\.[^@]+")
 from helper import generar_token, enviar_mail, verificar_token
+from analytics import agregados_por_mes, combinar_meses, invalidar_mes, resumen
+from particiones import PARTICION_DEFAULT, cargar_particiones, crear_particion, etiqueta, lock_particion, lock_usuario
+from particiones import ruta_indice_usuario
+from particiones import ruta as ruta_particion
+from flask import jsonify
+from markupsafe import escape
 
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
-AVAIL_FILE = os.path.join(DATA_DIR, "availability.json")
-BOOKINGS_FILE = os.path.join(DATA_DIR, "bookings.json")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
 
+# Archivos por partición (profesional + sede); se resuelven con archivo(clave, ...)
+AVAIL_FILE = "availability.json"
+BOOKINGS_FILE = "bookings.json"
+ANALYTICS_CACHE_FILE = "analytics_cache.json"
+
 try:
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         config = json.load(f)
         ADMIN_CODE = config.get("ADMIN_CODE")
         EMAIL_USER = config.get("EMAIL_USER")
         EMAIL_PASS = config.get("EMAIL_PASS")
+        PRECIO_SESION = config.get("PRECIO_SESION")
 
 except FileNotFoundError:
     ADMIN_CODE = None
+    PRECIO_SESION = None
     print(f"Advertencia: no se encontró {CONFIG_PATH}, ADMIN_CODE será None")
 
+if PRECIO_SESION is not None:
+    # En config.json todo viene como texto; se convierte una sola vez al arrancar
+    try:
+        precio = float(PRECIO_SESION)
+        if not math.isfinite(precio) or precio < 0:
+            raise ValueError(PRECIO_SESION)
+        PRECIO_SESION = precio
+    except (TypeError, ValueError):
+        print(f"Advertencia: PRECIO_SESION inválido ({PRECIO_SESION!r}), se ignora")
+        PRECIO_SESION = None
+
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY") or config.get("SECRET_KEY") or "cambiar-en-produccion"
@@ -73,6 +96,58 @@ def load_user(user_id):
         )
     return None
 
+def archivo(clave, nombre):
+    return ruta_particion(DATA_DIR, clave, nombre)
+
+def obtener_particion(clave):
+    clave = clave or PARTICION_DEFAULT
+    if clave not in cargar_particiones(DATA_DIR):
+        abort(404)
+    return clave
+
+def particiones_filtradas(particiones, filtro_particion):
+    # Sin filtro se recorren todas las particiones
+    if filtro_particion:
+        return [obtener_particion(filtro_particion)]
+    return list(particiones)
+
+def es_futura(fecha, hora):
+    try:
+        return datetime.strptime(f"{fecha} {hora}", "%Y-%m-%d %H:%M") > datetime.now()
+    except ValueError:
+        return False  # en caso de error de formato, ignorar
+
+def buscar_reserva_futura(particiones, username):
+    for clave in particiones:
+        for d, hs in load_json(archivo(clave, BOOKINGS_FILE)).items():
+            for h, us in hs.items():
+                if username in us and es_futura(d, h):
+                    return {"particion": clave, "fecha": d, "hora": h}
+    return {}
+
+def tiene_reserva_futura(particiones, username):
+    # Debe llamarse con lock_usuario tomado. Se consulta el índice del usuario
+    # y solo el shard que éste indica; recorrer todas las particiones queda
+    # para la primera vez, cuando el índice todavía no existe.
+    path = ruta_indice_usuario(DATA_DIR, username)
+    if not os.path.exists(path):
+        indice = buscar_reserva_futura(particiones, username)
+        save_json(path, indice)
+        return bool(indice)
+    indice = load_json(path)
+    if not indice or indice.get("particion") not in particiones:
+        return False
+    if not es_futura(indice["fecha"], indice["hora"]):
+        return False
+    bookings = load_json(archivo(indice["particion"], BOOKINGS_FILE))
+    return username in bookings.get(indice["fecha"], {}).get(indice["hora"], {})
+
+def agregados_particion(clave):
+    # Sin lock de partición: _lock_cache alcanza, porque invalidar_mes corre
+    # después de cada guardado, y así la analítica no frena reservas
+    return agregados_por_mes(archivo(clave, BOOKINGS_FILE), archivo(clave, AVAIL_FILE),
+                             archivo(clave, ANALYTICS_CACHE_FILE))
+
 def obtener_emails_administradores():
     users = load_json(USERS_FILE)
     return [info["email"] for info in users.values() if info.get("is_admin") and info.get("email")]
@@ -163,32 +238,44 @@ def admin_agenda():
         flash("Acceso denegado", "error")
         return redirect(url_for("index"))
 
-    bookings = load_json(BOOKINGS_FILE)
+    particiones = cargar_particiones(DATA_DIR)
+    filtro_particion = request.args.get("particion", "")
     users = load_json(USERS_FILE)
 
     full_bookings = {}
-    for date, hours in bookings.items():
-        full_bookings[date] = {}
-        for hour, users_dict in hours.items():
-            user_infos = []
-            for username, meta in users_dict.items():
-                info = users.get(username, {})
-                full_name = f"{info.get('first_name', '')} {info.get('last_name', '')}".strip()
-                phone = info.get('phone', 'Sin celular')
-                categoria = info.get('categoria', 'Sin categoría')
-                pagado = meta.get("pagado", False)
-                pagado_checked = "checked" if pagado else ""
-                btn = f'''
-                    <form method="post" action="{url_for('toggle_paid', date=date, hour=hour, username=username)}" style="display:inline">
-                        <input type="checkbox" onChange="this.form.submit()" {pagado_checked}>
-                    </form>
-                '''
-                user_infos.append(
-                    f"{full_name} ({phone}) - Categoría: {categoria} - Pagado: {btn}"
-                )
-            full_bookings[date][hour] = user_infos
-
-    return render_template("admin_agenda.html", bookings=full_bookings)
+    for clave in particiones_filtradas(particiones, filtro_particion):
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
+        # La etiqueta es texto libre cargado por un admin y la plantilla usa |safe
+        prefijo = "" if filtro_particion else f"[{escape(etiqueta(particiones[clave]))}] "
+        for date, hours in bookings.items():
+            full_bookings.setdefault(date, {})
+            for hour, users_dict in hours.items():
+                user_infos = full_bookings[date].setdefault(hour, [])
+                for username, meta in users_dict.items():
+                    info = users.get(username, {})
+                    full_name = f"{info.get('first_name', '')} {info.get('last_name', '')}".strip()
+                    phone = info.get('phone', 'Sin celular')
+                    categoria = info.get('categoria', 'Sin categoría')
+                    pagado = meta.get("pagado", False)
+                    pagado_checked = "checked" if pagado else ""
+                    ausente_checked = "checked" if meta.get("ausente", False) else ""
+                    btn = f'''
+                        <form method="post" action="{url_for('toggle_paid', date=date, hour=hour, username=username, particion=clave, filtro=filtro_particion or None)}" style="display:inline">
+                            <input type="checkbox" onChange="this.form.submit()" {pagado_checked}>
+                        </form>
+                    '''
+                    btn_ausente = f'''
+                        <form method="post" action="{url_for('toggle_ausente', date=date, hour=hour, username=username, particion=clave, filtro=filtro_particion or None)}" style="display:inline">
+                            <input type="checkbox" onChange="this.form.submit()" {ausente_checked}>
+                        </form>
+                    '''
+                    user_infos.append(
+                        f"{prefijo}{full_name} ({phone}) - Categoría: {categoria} - Pagado: {btn} - Ausente: {btn_ausente}"
+                    )
+
+    full_bookings = {d: dict(sorted(full_bookings[d].items())) for d in sorted(full_bookings)}
+    return render_template("admin_agenda.html", bookings=full_bookings,
+                           particiones=particiones, filtro_particion=filtro_particion)
 
 @app.route("/admin/toggle_paid/<date>/<hour>/<username>", methods=["POST"])
 @login_required
@@ -197,17 +284,42 @@ def toggle_paid(date, hour, username):
         flash("Acceso denegado", "error")
         return redirect(url_for("index"))
 
-    bookings = load_json(BOOKINGS_FILE)
+    clave = obtener_particion(request.args.get("particion"))
+    with lock_particion(DATA_DIR, clave):
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
 
-    if date in bookings and hour in bookings[date] and username in bookings[date][hour]:
-        pagado_actual = bookings[date][hour][username].get("pagado", False)
-        bookings[date][hour][username]["pagado"] = not pagado_actual
-        save_json(BOOKINGS_FILE, bookings)
-        flash(f"Estado de pago actualizado para {username} en {date} {hour}", "success")
-    else:
-        flash("No se encontró la reserva", "error")
+        if date in bookings and hour in bookings[date] and username in bookings[date][hour]:
+            pagado_actual = bookings[date][hour][username].get("pagado", False)
+            bookings[date][hour][username]["pagado"] = not pagado_actual
+            save_json(archivo(clave, BOOKINGS_FILE), bookings)
+            invalidar_mes(archivo(clave, ANALYTICS_CACHE_FILE), date)
+            flash(f"Estado de pago actualizado para {username} en {date} {hour}", "success")
+        else:
+            flash("No se encontró la reserva", "error")
+
+    return redirect(url_for("admin_agenda", particion=request.args.get("filtro") or None))
+
+@app.route("/admin/toggle_ausente/<date>/<hour>/<username>", methods=["POST"])
+@login_required
+def toggle_ausente(date, hour, username):
+    if not current_user.is_admin:
+        flash("Acceso denegado", "error")
+        return redirect(url_for("index"))
+
+    clave = obtener_particion(request.args.get("particion"))
+    with lock_particion(DATA_DIR, clave):
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
 
-    return redirect(url_for("admin_agenda"))
+        if date in bookings and hour in bookings[date] and username in bookings[date][hour]:
+            ausente_actual = bookings[date][hour][username].get("ausente", False)
+            bookings[date][hour][username]["ausente"] = not ausente_actual
+            save_json(archivo(clave, BOOKINGS_FILE), bookings)
+            invalidar_mes(archivo(clave, ANALYTICS_CACHE_FILE), date)
+            flash(f"Asistencia actualizada para {username} en {date} {hour}", "success")
+        else:
+            flash("No se encontró la reserva", "error")
+
+    return redirect(url_for("admin_agenda", particion=request.args.get("filtro") or None))
 
 @app.route("/logout")
 @login_required
@@ -227,7 +339,9 @@ def admin():
     if not getattr(current_user, "is_admin", False):
         flash("Acceso denegado", "error")
         return redirect(url_for("index"))
+    particiones = cargar_particiones(DATA_DIR)
     if request.method == "POST":
+        clave = obtener_particion(request.form.get("particion"))
         date_str = request.form.get("date")
         start = request.form.get("start")
         end = request.form.get("end")
@@ -250,68 +364,94 @@ def admin():
         while current + timedelta(hours=1) <= end_dt:
             slots.append(current.strftime("%H:%M"))
             current += timedelta(hours=1)
-        av = load_json(AVAIL_FILE)
-        av[date_str] = slots
-        save_json(AVAIL_FILE, av)
-        flash(f"Disponibilidad establecida para {date_str}: {', '.join(slots)}", "success")
+        with lock_particion(DATA_DIR, clave):
+            av = load_json(archivo(clave, AVAIL_FILE))
+            av[date_str] = slots
+            save_json(archivo(clave, AVAIL_FILE), av)
+            invalidar_mes(archivo(clave, ANALYTICS_CACHE_FILE), date_str)
+        flash(f"Disponibilidad establecida para {date_str} ({etiqueta(particiones[clave])}): {', '.join(slots)}", "success")
         return redirect(url_for("admin"))
-    av = load_json(AVAIL_FILE)
-    dates = sorted(av.keys())
-    return render_template("admin.html", availability=av, dates=dates)
+    disponibilidad = []
+    for clave, particion in particiones.items():
+        av = load_json(archivo(clave, AVAIL_FILE))
+        disponibilidad.append((etiqueta(particion), av, sorted(av.keys())))
+    return render_template("admin.html", particiones=particiones, disponibilidad=disponibilidad)
+
+@app.route("/admin/particiones", methods=["POST"])
+@login_required
+def admin_particiones():
+    if not current_user.is_admin:
+        flash("Acceso denegado", "error")
+        return redirect(url_for("index"))
+
+    profesional = request.form.get("profesional", "").strip()
+    sede = request.form.get("sede", "").strip()
+    if not profesional or not sede:
+        flash("Profesional y sede son obligatorios", "error")
+        return redirect(url_for("admin"))
+    try:
+        crear_particion(DATA_DIR, profesional, sede)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("admin"))
+    flash(f"Agregado: {profesional} - {sede}", "success")
+    return redirect(url_for("admin"))
 
 @app.route("/availability", methods=["GET", "POST"])
 @login_required
 def availability():
-    av = load_json(AVAIL_FILE)
+    particiones = cargar_particiones(DATA_DIR)
     if request.method == "POST":
+        clave = obtener_particion(request.form.get("particion"))
         date_str = request.form.get("date")
         hour = request.form.get("hour")
         if not date_str or not hour:
             flash("Seleccione fecha y hora", "error")
-            return redirect(url_for("availability"))
+            return redirect(url_for("availability", particion=clave))
+        av = load_json(archivo(clave, AVAIL_FILE))
         if date_str not in av or hour not in av[date_str]:
             flash("Slot no disponible", "error")
-            return redirect(url_for("availability"))
-
-        bookings = load_json(BOOKINGS_FILE)
-
-        # --- Control: impedir múltiples reservas futuras ---
-        now = datetime.now()
-        for d, hs in bookings.items():
-            for h, us in hs.items():
-                if current_user.id in us:
-                    try:
-                        dt = datetime.strptime(f"{d} {h}", "%Y-%m-%d %H:%M")
-                        if dt > now:
-                            flash("Ya tenés una reserva activa a futuro. Solo se permite una.", "error")
-                            return redirect(url_for("availability"))
-                    except ValueError:
-                        continue  # en caso de error de formato, ignorar
-
-        day_bookings = bookings.get(date_str, {})
-        users_dict = day_bookings.get(hour, {})
-
-        if current_user.id in users_dict:
-            flash("Ya reservaste ese turno", "error")
-            return redirect(url_for("availability"))
-
-        if len(users_dict) >= 2:
-            flash("Ese slot ya está completo", "error")
-            return redirect(url_for("availability"))
-
-        users_dict[current_user.id] = {"pagado": False}
-        day_bookings[hour] = users_dict
-        bookings[date_str] = day_bookings
-        save_json(BOOKINGS_FILE, bookings)
+            return redirect(url_for("availability", particion=clave))
+
+        # El lock del usuario cubre el control de una sola reserva futura (en
+        # cualquier partición) y la escritura; el de la partición, el cupo del
+        # turno. Reservas de distintos usuarios y profesionales no se esperan.
+        with lock_usuario(DATA_DIR, current_user.id):
+            if tiene_reserva_futura(particiones, current_user.id):
+                flash("Ya tenés una reserva activa a futuro. Solo se permite una.", "error")
+                return redirect(url_for("availability", particion=clave))
+
+            with lock_particion(DATA_DIR, clave):
+                bookings = load_json(archivo(clave, BOOKINGS_FILE))
+                day_bookings = bookings.get(date_str, {})
+                users_dict = day_bookings.get(hour, {})
+
+                if current_user.id in users_dict:
+                    flash("Ya reservaste ese turno", "error")
+                    return redirect(url_for("availability", particion=clave))
+
+                if len(users_dict) >= 2:
+                    flash("Ese slot ya está completo", "error")
+                    return redirect(url_for("availability", particion=clave))
+
+                users_dict[current_user.id] = {"pagado": False}
+                day_bookings[hour] = users_dict
+                bookings[date_str] = day_bookings
+                save_json(archivo(clave, BOOKINGS_FILE), bookings)
+                invalidar_mes(archivo(clave, ANALYTICS_CACHE_FILE), date_str)
+            save_json(ruta_indice_usuario(DATA_DIR, current_user.id),
+                      {"particion": clave, "fecha": date_str, "hora": hour})
         flash(f"Turno reservado: {date_str} {hour}", "success")
         admin_emails = obtener_emails_administradores()
         usuario = f"{current_user.first_name} {current_user.last_name}"
-        msg = f"{usuario} ha reservado un turno para el {date_str} a las {hour}."
+        msg = f"{usuario} ha reservado un turno para el {date_str} a las {hour} ({etiqueta(particiones[clave])})."
         for email in admin_emails:
             enviar_mail(email, "Nueva reserva registrada", msg, EMAIL_USER, EMAIL_PASS)
         return redirect(url_for("my_bookings"))
 
-    bookings = load_json(BOOKINGS_FILE)
+    clave = obtener_particion(request.args.get("particion"))
+    av = load_json(archivo(clave, AVAIL_FILE))
+    bookings = load_json(archivo(clave, BOOKINGS_FILE))
     avail_display = {}
     for date_str, slots in av.items():
         free_hours = []
@@ -322,43 +462,56 @@ def availability():
         if free_hours:
             avail_display[date_str] = free_hours
     dates = sorted(avail_display.keys())
-    return render_template("view_availability.html", availability=avail_display, dates=dates)
+    return render_template("view_availability.html", availability=avail_display, dates=dates,
+                           particiones=particiones, particion=clave)
 
 
 @app.route("/my_bookings")
 @login_required
 def my_bookings():
-    bookings = load_json(BOOKINGS_FILE)
+    particiones = cargar_particiones(DATA_DIR)
     my = []
-    for date_str, hours_map in bookings.items():
-        for hour, users_map in hours_map.items():
-            if current_user.id in users_map:
-                pagado = users_map[current_user.id].get("pagado", False)
-                my.append((date_str, hour, pagado))
+    for clave, particion in particiones.items():
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
+        for date_str, hours_map in bookings.items():
+            for hour, users_map in hours_map.items():
+                if current_user.id in users_map:
+                    pagado = users_map[current_user.id].get("pagado", False)
+                    my.append((date_str, hour, pagado, clave, etiqueta(particion)))
     my_sorted = sorted(my, key=lambda x: (x[0], x[1]))
     return render_template("my_bookings.html", bookings=my_sorted)
 
 @app.route("/cancel/<date_str>/<hour>", methods=["POST"])
 @login_required
 def cancel(date_str, hour):
-    bookings = load_json(BOOKINGS_FILE)
-    day_bookings = bookings.get(date_str, {})
-    users_dict = day_bookings.get(hour, {})
-    if current_user.id in users_dict:
-        users_dict.pop(current_user.id)
-        if users_dict:
-            day_bookings[hour] = users_dict
-        else:
-            day_bookings.pop(hour, None)
-        if day_bookings:
-            bookings[date_str] = day_bookings
-        else:
-            bookings.pop(date_str, None)
-        save_json(BOOKINGS_FILE, bookings)
+    particiones = cargar_particiones(DATA_DIR)
+    clave = obtener_particion(request.form.get("particion"))
+    with lock_usuario(DATA_DIR, current_user.id):
+        with lock_particion(DATA_DIR, clave):
+            bookings = load_json(archivo(clave, BOOKINGS_FILE))
+            day_bookings = bookings.get(date_str, {})
+            users_dict = day_bookings.get(hour, {})
+            encontrada = current_user.id in users_dict
+            if encontrada:
+                users_dict.pop(current_user.id)
+                if users_dict:
+                    day_bookings[hour] = users_dict
+                else:
+                    day_bookings.pop(hour, None)
+                if day_bookings:
+                    bookings[date_str] = day_bookings
+                else:
+                    bookings.pop(date_str, None)
+                save_json(archivo(clave, BOOKINGS_FILE), bookings)
+                invalidar_mes(archivo(clave, ANALYTICS_CACHE_FILE), date_str)
+        indice_path = ruta_indice_usuario(DATA_DIR, current_user.id)
+        if encontrada and load_json(indice_path) == {"particion": clave, "fecha": date_str, "hora": hour}:
+            save_json(indice_path, {})
+    if encontrada:
         flash(f"Reserva cancelada: {date_str} {hour}", "info")
         admin_emails = obtener_emails_administradores()
         usuario = f"{current_user.first_name} {current_user.last_name}"
-        msg = f"{usuario} ha cancelado un turno para el {date_str} a las {hour}."
+        msg = f"{usuario} ha cancelado un turno para el {date_str} a las {hour} ({etiqueta(particiones[clave])})."
         for email in admin_emails:
             enviar_mail(email, "Cancelación registrada", msg, EMAIL_USER, EMAIL_PASS)
     else:
@@ -406,51 +559,56 @@ def admin_historial():
         flash("Acceso denegado", "error")
         return redirect(url_for("index"))
 
-    bookings = load_json(BOOKINGS_FILE)
+    particiones = cargar_particiones(DATA_DIR)
     users = load_json(USERS_FILE)
 
     filtro = request.form.get("filtro")
     fecha = request.form.get("fecha")
+    filtro_particion = request.form.get("particion", "")
     resultados = []
 
-    def agregar_resultado(fecha_str, hora, username, meta):
+    def agregar_resultado(fecha_str, hora, username, meta, particion):
         user = users.get(username, {})
         nombre = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
         telefono = user.get('phone', 'Sin celular')
         categoria = user.get('categoria', 'Sin categoría')
         pagado = "Sí" if meta.get("pagado") else "No"
-        resultados.append((fecha_str, hora, nombre, telefono, categoria, pagado))
-
-    for date_str, horas in bookings.items():
-        for hora, usuarios in horas.items():
-            for username, meta in usuarios.items():
-                try:
-                    dt = datetime.strptime(f"{date_str} {hora}", "%Y-%m-%d %H:%M")
-                except ValueError:
-                    continue
-
-                if filtro == "dia" and fecha:
-                    if date_str == fecha:
-                        agregar_resultado(date_str, hora, username, meta)
-
-                elif filtro == "semana" and fecha:
+        resultados.append((fecha_str, hora, nombre, telefono, categoria, pagado, particion))
+
+    for clave in particiones_filtradas(particiones, filtro_particion):
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
+        particion = etiqueta(particiones[clave])
+        for date_str, horas in bookings.items():
+            for hora, usuarios in horas.items():
+                for username, meta in usuarios.items():
                     try:
-                        inicio_semana = datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=datetime.strptime(fecha, "%Y-%m-%d").weekday())
-                        fin_semana = inicio_semana + timedelta(days=6)
-                        if inicio_semana.date() <= dt.date() <= fin_semana.date():
-                            agregar_resultado(date_str, hora, username, meta)
+                        dt = datetime.strptime(f"{date_str} {hora}", "%Y-%m-%d %H:%M")
                     except ValueError:
                         continue
 
-                elif filtro == "mes" and fecha:
-                    if dt.strftime("%Y-%m") == fecha:
-                        agregar_resultado(date_str, hora, username, meta)
+                    if filtro == "dia" and fecha:
+                        if date_str == fecha:
+                            agregar_resultado(date_str, hora, username, meta, particion)
+
+                    elif filtro == "semana" and fecha:
+                        try:
+                            inicio_semana = datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=datetime.strptime(fecha, "%Y-%m-%d").weekday())
+                            fin_semana = inicio_semana + timedelta(days=6)
+                            if inicio_semana.date() <= dt.date() <= fin_semana.date():
+                                agregar_resultado(date_str, hora, username, meta, particion)
+                        except ValueError:
+                            continue
 
-                elif not filtro:
-                    agregar_resultado(date_str, hora, username, meta)
+                    elif filtro == "mes" and fecha:
+                        if dt.strftime("%Y-%m") == fecha:
+                            agregar_resultado(date_str, hora, username, meta, particion)
+
+                    elif not filtro:
+                        agregar_resultado(date_str, hora, username, meta, particion)
 
     resultados.sort(key=lambda x: (x[0], x[1]))  # ordenar por fecha y hora
-    return render_template("admin_historial.html", resultados=resultados, filtro=filtro, fecha=fecha)
+    return render_template("admin_historial.html", resultados=resultados, filtro=filtro, fecha=fecha,
+                           particiones=particiones, filtro_particion=filtro_particion)
 
 @app.route("/admin/historial/export", methods=["POST"])
 @login_required
@@ -461,47 +619,51 @@ def export_historial_csv():
 
     filtro = request.form.get("filtro")
     fecha = request.form.get("fecha")
+    filtro_particion = request.form.get("particion", "")
 
-    bookings = load_json(BOOKINGS_FILE)
+    particiones = cargar_particiones(DATA_DIR)
     users = load_json(USERS_FILE)
 
-    filas = [("Fecha", "Hora", "Usuario", "Teléfono", "Categoría", "Pagado")]
+    filas = [("Fecha", "Hora", "Usuario", "Teléfono", "Categoría", "Pagado", "Profesional - Sede")]
 
-    def agregar_fila(date_str, hour, username, meta):
+    def agregar_fila(date_str, hour, username, meta, particion):
         user = users.get(username, {})
         nombre = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
         telefono = user.get('phone', 'Sin celular')
         categoria = user.get('categoria', 'Sin categoría')
         pagado = "Sí" if meta.get("pagado") else "No"
-        filas.append((date_str, hour, nombre, telefono, categoria, pagado))
-
-    for date_str, horas in bookings.items():
-        for hora, usuarios in horas.items():
-            for username, meta in usuarios.items():
-                try:
-                    dt = datetime.strptime(f"{date_str} {hora}", "%Y-%m-%d %H:%M")
-                except ValueError:
-                    continue
-
-                if filtro == "dia" and fecha:
-                    if date_str == fecha:
-                        agregar_fila(date_str, hora, username, meta)
-
-                elif filtro == "semana" and fecha:
+        filas.append((date_str, hour, nombre, telefono, categoria, pagado, particion))
+
+    for clave in particiones_filtradas(particiones, filtro_particion):
+        bookings = load_json(archivo(clave, BOOKINGS_FILE))
+        particion = etiqueta(particiones[clave])
+        for date_str, horas in bookings.items():
+            for hora, usuarios in horas.items():
+                for username, meta in usuarios.items():
                     try:
-                        inicio = datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=datetime.strptime(fecha, "%Y-%m-%d").weekday())
-                        fin = inicio + timedelta(days=6)
-                        if inicio.date() <= dt.date() <= fin.date():
-                            agregar_fila(date_str, hora, username, meta)
+                        dt = datetime.strptime(f"{date_str} {hora}", "%Y-%m-%d %H:%M")
                     except ValueError:
                         continue
 
-                elif filtro == "mes" and fecha:
-                    if dt.strftime("%Y-%m") == fecha:
-                        agregar_fila(date_str, hora, username, meta)
+                    if filtro == "dia" and fecha:
+                        if date_str == fecha:
+                            agregar_fila(date_str, hora, username, meta, particion)
+
+                    elif filtro == "semana" and fecha:
+                        try:
+                            inicio = datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=datetime.strptime(fecha, "%Y-%m-%d").weekday())
+                            fin = inicio + timedelta(days=6)
+                            if inicio.date() <= dt.date() <= fin.date():
+                                agregar_fila(date_str, hora, username, meta, particion)
+                        except ValueError:
+                            continue
+
+                    elif filtro == "mes" and fecha:
+                        if dt.strftime("%Y-%m") == fecha:
+                            agregar_fila(date_str, hora, username, meta, particion)
 
-                elif not filtro:
-                    agregar_fila(date_str, hora, username, meta)
+                    elif not filtro:
+                        agregar_fila(date_str, hora, username, meta, particion)
 
     # Crear CSV
     si = StringIO()
@@ -519,6 +681,37 @@ def export_historial_csv():
     )
 
 
+@app.route("/admin/analitica")
+@login_required
+def admin_analitica():
+    if not current_user.is_admin:
+        flash("Acceso denegado", "error")
+        return redirect(url_for("index"))
+
+    particiones = cargar_particiones(DATA_DIR)
+    filtro_particion = request.args.get("particion", "")
+    por_mes = combinar_meses(
+        agregados_particion(clave) for clave in particiones_filtradas(particiones, filtro_particion)
+    )
+    users = load_json(USERS_FILE)
+    datos = resumen(por_mes, users, PRECIO_SESION)
+    return render_template("admin_analitica.html", datos=datos, precio_sesion=PRECIO_SESION,
+                           particiones=particiones, filtro_particion=filtro_particion)
+
+@app.route("/admin/analitica/datos")
+@login_required
+def admin_analitica_datos():
+    if not current_user.is_admin:
+        abort(403)
+
+    particiones = cargar_particiones(DATA_DIR)
+    por_mes = combinar_meses(
+        agregados_particion(clave) for clave in particiones_filtradas(particiones, request.args.get("particion", ""))
+    )
+    users = load_json(USERS_FILE)
+    return jsonify(resumen(por_mes, users, PRECIO_SESION))
+
+
 @app.route("/confirmar/<token>")
 def confirmar_email(token):
     email = verificar_token(token, app.secret_key)
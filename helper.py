@@ -1,9 +1,27 @@
 from filelock import FileLock
+from datetime import datetime
 import json
+import os
+import shutil
 import smtplib
+import stat
+import tempfile
 from email.mime.text import MIMEText
 from itsdangerous import URLSafeTimedSerializer
 
+# Por encima de este tamaño (en bytes) los JSON se guardan compactos, sin indentar
+COMPACT_THRESHOLD = 256 * 1024
+# Cantidad de snapshots que se conservan por archivo y segundos mínimos entre dos snapshots
+MAX_SNAPSHOTS = 24
+SNAPSHOT_INTERVAL = 3600
+BACKUP_DIRNAME = "backups"
+SNAPSHOT_TS_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+# os.umask solo se puede leer cambiándolo, y el cambio afecta a todo el
+# proceso; se lee una única vez al importar, antes de que haya otros hilos.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 def enviar_mail(destinatario, asunto, cuerpo, remitente, password):
     msg = MIMEText(cuerpo)
@@ -43,7 +61,130 @@ def load_json(path):
             return {}
 
 def save_json(path, data):
+    contenido = _serializar(data)
+    lock = FileLock(f"{path}.lock")
+    with lock:
+        _snapshot(path)
+        _escribir_atomico(path, contenido)
+
+
+def _serializar(data):
+    # Los archivos chicos quedan legibles; los grandes se escriben compactos
+    compacto = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    if len(compacto) > COMPACT_THRESHOLD:
+        return compacto
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def _escribir_atomico(path, contenido):
+    # Se escribe en un temporal del mismo directorio, se fuerza a disco y recién
+    # entonces se reemplaza el original: nunca queda un archivo truncado a medias.
+    directorio = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directorio, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directorio, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el temporal con 0600; se conservan los permisos del original
+        os.chmod(tmp_path, _modo_archivo(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directorio(directorio)
+
+
+def _modo_archivo(path):
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o644 & ~_UMASK
+
+
+def _fsync_directorio(directorio):
+    # Persiste el rename; en Windows no se puede abrir un directorio y se ignora
+    try:
+        fd = os.open(directorio, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _backup_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), BACKUP_DIRNAME)
+
+
+def listar_snapshots(path):
+    """Devuelve las rutas de los snapshots de `path`, del más viejo al más nuevo."""
+    carpeta = _backup_dir(path)
+    nombre, ext = os.path.splitext(os.path.basename(path))
+    prefijo = f"{nombre}."
+    try:
+        archivos = os.listdir(carpeta)
+    except FileNotFoundError:
+        return []
+    snapshots = [a for a in archivos if a.startswith(prefijo) and a.endswith(ext)]
+    return [os.path.join(carpeta, a) for a in sorted(snapshots)]
+
+
+def _snapshot(path, forzar=False):
+    # Debe llamarse con el lock de `path` tomado
+    if not os.path.exists(path):
+        return None
+    snapshots = listar_snapshots(path)
+    if snapshots and not forzar:
+        ultimo = os.path.getmtime(snapshots[-1])
+        if datetime.now().timestamp() - ultimo < SNAPSHOT_INTERVAL:
+            return None
+
+    carpeta = _backup_dir(path)
+    os.makedirs(carpeta, exist_ok=True)
+    nombre, ext = os.path.splitext(os.path.basename(path))
+    destino = os.path.join(carpeta, f"{nombre}.{datetime.now().strftime(SNAPSHOT_TS_FORMAT)}{ext}")
+    # El archivo vivo siempre se reemplaza con os.replace, así que un hard link
+    # conserva la versión actual sin copiar bytes. Si el sistema no lo soporta, se copia.
+    try:
+        os.link(path, destino)
+        os.utime(destino)
+    except OSError:
+        shutil.copy2(path, destino)
+        os.utime(destino)
+    snapshots.append(destino)
+
+    for viejo in snapshots[:-MAX_SNAPSHOTS]:
+        try:
+            os.remove(viejo)
+        except OSError:
+            pass
+    return destino
+
+
+def restaurar_snapshot(path, snapshot=None):
+    """Restaura `path` desde un snapshot (por defecto el más reciente).
+
+    Antes de pisar el archivo se guarda un snapshot del estado actual, así la
+    restauración también se puede deshacer. Devuelve la ruta del snapshot usado.
+    """
     lock = FileLock(f"{path}.lock")
     with lock:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if snapshot is None:
+            snapshots = listar_snapshots(path)
+            if not snapshots:
+                raise FileNotFoundError(f"No hay snapshots para {path}")
+            snapshot = snapshots[-1]
+        with open(snapshot, "r", encoding="utf-8") as f:
+            contenido = f.read()
+        json.loads(contenido)  # no restaurar algo que tampoco se pueda leer
+        _snapshot(path, forzar=True)
+        _escribir_atomico(path, contenido)
+    return snapshot
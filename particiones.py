@@ -0,0 +1,83 @@
+import hashlib
+import os
+import re
+import unicodedata
+from filelock import FileLock
+from helper import load_json, save_json
+
+# La partición por defecto sigue usando los archivos históricos de data/,
+# así los datos existentes no necesitan migración.
+PARTICION_DEFAULT = "principal"
+PARTICIONES_FILE = "particiones.json"
+SHARDS_DIRNAME = "particiones"
+
+
+def cargar_particiones(data_dir):
+    """Devuelve {clave: {"profesional": ..., "sede": ...}} con la partición por defecto primero."""
+    registradas = load_json(os.path.join(data_dir, PARTICIONES_FILE))
+    particiones = {PARTICION_DEFAULT: {"profesional": "Principal", "sede": "Sede central"}}
+    particiones.update(registradas)
+    return particiones
+
+
+def etiqueta(particion):
+    return f"{particion.get('profesional', '')} - {particion.get('sede', '')}"
+
+
+def _slug(texto):
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-")
+
+
+def crear_particion(data_dir, profesional, sede):
+    """Registra un nuevo par profesional/sede y crea su carpeta. Devuelve la clave."""
+    clave = f"{_slug(profesional)}--{_slug(sede)}"
+    if clave == "--":
+        raise ValueError("Profesional y sede no pueden estar vacíos")
+    path = os.path.join(data_dir, PARTICIONES_FILE)
+    with FileLock(f"{path}.registro.lock"):
+        registradas = load_json(path)
+        if clave in registradas or clave == PARTICION_DEFAULT:
+            raise ValueError(f"La partición {clave} ya existe")
+        os.makedirs(os.path.join(data_dir, SHARDS_DIRNAME, clave), exist_ok=True)
+        registradas[clave] = {"profesional": profesional, "sede": sede}
+        save_json(path, registradas)
+    return clave
+
+
+def ruta(data_dir, clave, nombre):
+    """Ruta del archivo `nombre` (p.ej. bookings.json) dentro del shard de `clave`."""
+    if clave == PARTICION_DEFAULT:
+        return os.path.join(data_dir, nombre)
+    return os.path.join(data_dir, SHARDS_DIRNAME, clave, nombre)
+
+
+def lock_particion(data_dir, clave):
+    # Lock para las operaciones leer-modificar-guardar de una partición. Es
+    # distinto del lock por archivo de load_json/save_json, que se toma adentro.
+    return FileLock(ruta(data_dir, clave, "particion.lock"))
+
+
+def _nombre_usuario(username):
+    return hashlib.sha1(username.encode("utf-8")).hexdigest()
+
+
+def lock_usuario(data_dir, username):
+    # Lock por usuario para las reglas que abarcan todas las particiones (una
+    # sola reserva futura). Se toma antes que el de la partición, nunca después.
+    return FileLock(os.path.join(data_dir, "locks", f"{_nombre_usuario(username)}.lock"))
+
+
+def ruta_indice_usuario(data_dir, username):
+    """Índice con la reserva futura del usuario ({"particion", "fecha", "hora"} o {})."""
+    return os.path.join(data_dir, "usuarios", f"{_nombre_usuario(username)}.json")
+
+
+def clave_de_ruta(data_dir, path):
+    """Partición a la que pertenece un archivo de datos, o None si no es de ninguna."""
+    carpeta = os.path.dirname(os.path.abspath(path))
+    if carpeta == os.path.abspath(data_dir):
+        return PARTICION_DEFAULT
+    if os.path.dirname(carpeta) == os.path.abspath(os.path.join(data_dir, SHARDS_DIRNAME)):
+        return os.path.basename(carpeta)
+    return None
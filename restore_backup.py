@@ -0,0 +1,75 @@
+import os
+import sys
+from analytics import invalidar_todo
+from helper import listar_snapshots, restaurar_snapshot
+from particiones import clave_de_ruta, lock_particion
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+ANALYTICS_CACHE_FILE = "analytics_cache.json"
+
+
+def ruta_datos(nombre):
+    if not nombre.endswith(".json"):
+        nombre = f"{nombre}.json"
+    return os.path.join(DATA_DIR, nombre)
+
+
+def listar(nombre):
+    snapshots = listar_snapshots(ruta_datos(nombre))
+    if not snapshots:
+        print(f"No hay snapshots para {nombre}.")
+    for i, s in enumerate(snapshots):
+        print(f"[{i}] {os.path.basename(s)}")
+    return snapshots
+
+
+def restaurar(nombre, indice=None):
+    path = ruta_datos(nombre)
+    snapshot = None
+    if indice is not None:
+        snapshots = listar_snapshots(path)
+        if not 0 <= indice < len(snapshots):
+            print(f"Índice inválido: {indice}")
+            listar(nombre)
+            return False
+        snapshot = snapshots[indice]
+    clave = clave_de_ruta(DATA_DIR, path)
+    if clave is not None and os.path.basename(path) in ("bookings.json", "availability.json"):
+        # Con el lock de la partición, una reserva que leyó el shard antes de
+        # restaurar no puede guardar después y deshacer la restauración
+        with lock_particion(DATA_DIR, clave):
+            usado = restaurar_snapshot(path, snapshot)
+            # El cache de analítica por mes ya no corresponde a los datos restaurados
+            invalidar_todo(os.path.join(os.path.dirname(path), ANALYTICS_CACHE_FILE))
+    else:
+        usado = restaurar_snapshot(path, snapshot)
+    print(f"{os.path.basename(path)} restaurado desde {os.path.basename(usado)}")
+    return True
+
+
+if __name__ == "__main__":
+    # python restore_backup.py bookings          -> lista los snapshots
+    # python restore_backup.py particiones/<clave>/bookings  -> idem para otra partición
+    # python restore_backup.py bookings ultimo   -> restaura el más reciente
+    # python restore_backup.py bookings 3        -> restaura el snapshot [3]
+    uso = "Uso: python restore_backup.py <archivo> [ultimo|indice]"
+    if len(sys.argv) < 2:
+        print(uso)
+        sys.exit(1)
+    archivo = sys.argv[1]
+    if len(sys.argv) == 2:
+        listar(archivo)
+    elif sys.argv[2] == "ultimo":
+        try:
+            restaurar(archivo)
+        except FileNotFoundError as e:
+            print(e)
+            print(uso)
+            sys.exit(1)
+    elif sys.argv[2].isdigit():
+        if not restaurar(archivo, int(sys.argv[2])):
+            sys.exit(1)
+    else:
+        print(uso)
+        listar(archivo)
+        sys.exit(1)